@@ -0,0 +1,269 @@
+"""
+This module contains the fixtures shared by the tests.
+"""
+
+import os
+import re
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List
+import pytest
+import requests
+from filelock import FileLock
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from video_compressing.utils import get_media_duration
+
+MP4_URLS = [
+    "https://getsamplefiles.com/download/mp4/sample-1.mp4",
+    "https://getsamplefiles.com/download/mp4/sample-2.mp4"
+]
+MOV_URLS = [
+    "https://getsamplefiles.com/download/mov/sample-1.mov",
+    "https://getsamplefiles.com/download/mov/sample-2.mov"
+]
+
+# Synthetic sources (lavfi video pattern, sine frequency) used to generate offline test videos
+SYNTHETIC_SOURCES = [
+    ("testsrc", 440),
+    ("testsrc2", 880),
+]
+
+# Single HTTP session so that downloads reuse pooled keep-alive connections
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=Retry(total=3, backoff_factor=0.3)
+))
+
+# Downloaded files are shared by every test of the session, keyed by URL
+_DOWNLOAD_CACHE: Dict[str, Path] = {}
+_DOWNLOAD_LOCK = threading.Lock()
+
+
+def _download_one(video_url: str, download_dir: Path, session: requests.Session) -> Path:
+    """
+    Download a single video (or reuse the cached one) and return its path.
+    """
+    with _DOWNLOAD_LOCK:
+        if video_url in _DOWNLOAD_CACHE:
+            return _DOWNLOAD_CACHE[video_url]
+
+    video_name = video_url.split('/')[-1]
+    video_path = download_dir / video_name
+
+    # The directory is shared by all the pytest-xdist workers: only one of them downloads
+    with FileLock(f"{video_path}.lock"):
+        if not video_path.exists():
+            # Download video
+            with session.get(video_url, stream=True, timeout=10) as response:
+                response.raise_for_status()
+
+                # Reject error pages served with a 200 status before they enter the cache
+                content_type = response.headers.get("Content-Type", "")
+                assert content_type.startswith(("video/", "application/octet-stream")), \
+                    f"{video_url} did not return a video (Content-Type: {content_type})"
+
+                # Stream the raw body to disk with 1 MiB buffers, then move it in place so
+                # that an interrupted download never leaves a truncated file behind
+                partial_path = video_path.with_name(f"{video_name}.part")
+                try:
+                    response.raw.decode_content = True
+                    with open(partial_path, 'wb') as f:
+                        shutil.copyfileobj(response.raw, f, length=1024 * 1024)
+
+                    # Verify the download is complete and readable by ffprobe
+                    expected_size = response.headers.get("Content-Length")
+                    if expected_size and "Content-Encoding" not in response.headers:
+                        assert partial_path.stat().st_size == int(expected_size), \
+                            f"Download of {video_url} is incomplete"
+                    assert get_media_duration(partial_path) > 0, \
+                        f"Downloaded file {video_url} has zero duration"
+
+                    partial_path.replace(video_path)
+                finally:
+                    partial_path.unlink(missing_ok=True)
+
+    # Verify file size and content
+    assert video_path.stat().st_size > 0, f"Downloaded file {video_path} is empty"
+
+    with _DOWNLOAD_LOCK:
+        _DOWNLOAD_CACHE[video_url] = video_path
+    return video_path
+
+
+def _download_videos(video_urls: List[str], download_dir: Path) -> List[str]:
+    """
+    Download the videos concurrently and return their paths, in the order of the URLs.
+    """
+    video_paths = [None] * len(video_urls)
+
+    with ThreadPoolExecutor(max_workers=len(video_urls)) as executor:
+        futures = {
+            executor.submit(_download_one, video_url, download_dir, _SESSION): index
+            for index, video_url in enumerate(video_urls)
+        }
+        for future in as_completed(futures):
+            video_paths[futures[future]] = str(future.result())
+
+    return video_paths
+
+
+@pytest.fixture(scope="session", autouse=True)
+def ffmpeg_threads(request):
+    """
+    Fixture to share the cores between the pytest-xdist workers, so that their
+    FFmpeg processes do not oversubscribe the CPU
+    """
+    # pytest-xdist only sets these variables in its worker processes
+    if "PYTEST_XDIST_WORKER" not in os.environ or "FFMPEG_THREADS" in os.environ:
+        yield
+        return
+
+    # Tests are distributed one by one (--dist=load): no more workers than tests are busy
+    worker_count = int(os.environ.get("PYTEST_XDIST_WORKER_COUNT", "1"))
+    busy_worker_count = max(min(worker_count, len(request.session.items)), 1)
+    os.environ["FFMPEG_THREADS"] = str(max((os.cpu_count() or 1) // busy_worker_count, 1))
+    yield
+    del os.environ["FFMPEG_THREADS"]
+
+
+@pytest.fixture(scope="session")
+def videos_dir(tmp_path_factory) -> Path:
+    """
+    Fixture providing the download directory, shared by all the pytest-xdist workers
+    """
+    # Without xdist, a plain session directory is enough
+    if "PYTEST_XDIST_WORKER" not in os.environ:
+        return tmp_path_factory.mktemp("shared_videos")
+
+    # With xdist, the parent of the worker's base directory is the run's base directory:
+    # it is shared by the workers of this run only, and rotated by pytest like any other
+    download_dir = tmp_path_factory.getbasetemp().parent / "shared_videos"
+    download_dir.mkdir(exist_ok=True)
+    return download_dir
+
+
+@pytest.fixture(scope="session")
+def mp4_files(videos_dir) -> List[str]:
+    """
+    Fixture to download the small test .MP4 video files once per session
+    """
+    return _download_videos(MP4_URLS, videos_dir)
+
+
+@pytest.fixture(scope="session")
+def mov_files(videos_dir) -> List[str]:
+    """
+    Fixture to download the small test .MOV video files once per session
+    """
+    return _download_videos(MOV_URLS, videos_dir)
+
+
+def _generate_videos(output_dir: Path, extension: str) -> List[str]:
+    """
+    Generate the synthetic videos with ffmpeg and return their paths.
+    """
+    video_paths = []
+
+    for index, (video_source, audio_frequency) in enumerate(SYNTHETIC_SOURCES, start=1):
+        video_path = output_dir / f"synthetic-{index}.{extension}"
+        subprocess.run(
+            [
+                "ffmpeg",
+                "-y",
+                "-f", "lavfi",
+                "-i", f"{video_source}=duration=2:size=320x240:rate=15",
+                "-f", "lavfi",
+                "-i", f"sine=frequency={audio_frequency}:duration=2",
+                # Temporal noise makes the video weigh like camera footage rather than a
+                # few kB, so that the sizes are dominated by the video stream
+                "-vf", "noise=alls=20:allf=t",
+                "-c:v", "libx264",
+                "-preset", "ultrafast",
+                "-pix_fmt", "yuv420p",
+                "-c:a", "aac",
+                "-shortest",
+                str(video_path),
+            ],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        video_paths.append(str(video_path))
+
+    return video_paths
+
+
+@pytest.fixture(scope="session")
+def synthetic_videos_dir(tmp_path_factory) -> Path:
+    """
+    Fixture providing the directory of the synthetic videos, with cleanup
+    at the end of the session
+    """
+    output_dir = tmp_path_factory.mktemp("synthetic_videos")
+
+    yield output_dir
+
+    # Cleanup: remove all files in the temporary directory
+    with os.scandir(output_dir) as entries:
+        for entry in entries:
+            os.unlink(entry.path)
+
+
+@pytest.fixture(scope="session")
+def synthetic_mp4_files(synthetic_videos_dir) -> List[str]:
+    """
+    Fixture to generate small synthetic .MP4 video files with ffmpeg once per session
+    """
+    return _generate_videos(synthetic_videos_dir, "mp4")
+
+
+@pytest.fixture(scope="session")
+def synthetic_mov_files(synthetic_videos_dir) -> List[str]:
+    """
+    Fixture to generate small synthetic .MOV video files with ffmpeg once per session
+    """
+    return _generate_videos(synthetic_videos_dir, "mov")
+
+
+@pytest.fixture(scope="function", params=[
+    # Testing offline with generated .mp4 files
+    "synthetic_mp4_files",
+    # Testing offline with generated .mov files
+    "synthetic_mov_files",
+    # Testing downloaded .mp4 format
+    pytest.param("mp4_files", marks=pytest.mark.network),
+    # Testing downloaded .mov format
+    pytest.param("mov_files", marks=pytest.mark.network),
+])
+def test_video_files(request) -> List[str]:
+    """
+    Fixture returning the test video files of the requested format
+    """
+    return request.getfixturevalue(request.param)
+
+
+@pytest.fixture(scope="function", params=[
+    False,
+    True
+], ids=["default_output", "named_output"])
+def optional_output_file(request) -> str:
+    """
+    Fixture to specify the name of the output_file, and ensure cleanup afterwards.
+    """
+    # Derive the name from the test id: unique across pytest-xdist workers and reproducible
+    use_output_file = request.param
+    test_name = re.sub(r"[^\w.-]", "_", request.node.nodeid)
+    output_file = f"test_out_{test_name}.mp4" if use_output_file else None
+
+    # Yield the output file path to the test function
+    yield output_file
+
+    # Cleanup: delete the file if it exists
+    if output_file and os.path.exists(output_file):
+        os.remove(output_file)
@@ -3,78 +3,24 @@ This module contains the tests for the processor functions.
 """
 
 import os
-import uuid
 import pytest
-import requests
-import numpy as np
-from video_compressing.utils import get_media_duration
+from video_compressing.utils import get_media_duration, get_video_bitrate, is_nvenc_available
 from video_compressing.processor import (
     reduce_video_size,
+    reduce_video_size_multi,
     reduce_and_merge_videos,
     merge_videos_to_single_mp4,
 )
 
 TOLERANCE = 0.01
 
-@pytest.fixture(scope="function", params=[
-    # Testing .mp4 format
-    [
-        "https://getsamplefiles.com/download/mp4/sample-1.mp4",
-        "https://getsamplefiles.com/download/mp4/sample-2.mp4"
-    ],
-    # Testing .mov format
-    [
-        "https://getsamplefiles.com/download/mov/sample-1.mov",
-        "https://getsamplefiles.com/download/mov/sample-2.mov"
-    ],
-])
-def test_video_files(tmp_path, request):
-    """
-    Fixture to download small test .MOV video files with cleanup
-    """
-    # Sample small video URLs (replace with reliable small video URLs)
-    video_urls = request.param
-    video_paths = []
-
-    for video_url in video_urls:
-        # Download video
-        response = requests.get(video_url, stream=True, timeout=10)
-        response.raise_for_status()
-        video_name = video_url.split('/')[-1]
-        video_path = tmp_path / video_name
-
-        with open(video_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-
-        # Verify file size and content
-        assert video_path.stat().st_size > 0, f"Downloaded file {video_path} is empty"
-        video_paths.append(str(video_path))
-
-
-    yield video_paths
-
-    # Cleanup: remove all files in the temporary directory
-    for path in tmp_path.iterdir():
-        path.unlink()
-
-
-@pytest.fixture(scope="function", params=[
-    None,
-    str(uuid.uuid1())
-])
-def optional_output_file(request) -> str:
-    """
-    Fixture to specify the name of the output_file, and ensure cleanup afterwards.
-    """
-    output_file = request.param
-
-    # Yield the output file path to the test function
-    yield output_file
-
-    # Cleanup: delete the file if it exists
-    if output_file and os.path.exists(output_file):
-        os.remove(output_file)
+ENCODERS = [
+    "libx264",
+    # "auto" only differs from libx264 when the GPU encoder is usable
+    pytest.param("auto", marks=pytest.mark.skipif(
+        not is_nvenc_available(), reason="h264_nvenc encoder is not available"
+    )),
+]
 
 
 def test_merge_videos_to_single_mp4(test_video_files, optional_output_file):
@@ -93,10 +39,10 @@ def test_merge_videos_to_single_mp4(test_video_files, optional_output_file):
         assert duration > 0, "Reduced video has zero duration"
 
         # Check file size
-        total_input_size = int(np.sum([
-            os.path.getsize(input_file) for input_file in test_video_files
-        ]))
-        output_size = os.path.getsize(output_file)
+        total_input_size = sum(
+            os.stat(input_file).st_size for input_file in test_video_files
+        )
+        output_size = os.stat(output_file).st_size
         assert output_size < total_input_size * (1 + TOLERANCE), \
             f"Output size {output_size} should not be higher than the input size {total_input_size}"
 
@@ -105,11 +51,14 @@ def test_merge_videos_to_single_mp4(test_video_files, optional_output_file):
         if output_file and output_file.exists():
             output_file.unlink()
 
-@pytest.mark.parametrize("reduction_factor", [0.2, 0.5, 1])
-def test_reduce_video_size(test_video_files, optional_output_file, reduction_factor):
+@pytest.mark.parametrize("encoder", ENCODERS)
+def test_reduce_video_size(test_video_files, optional_output_file, encoder):
     """
     Test video size reduction
     """
+    # The reduction factors are covered by test_reduce_video_size_multi: a single factor is
+    # enough to cover the single-output API
+    reduction_factor = 0.5
     created_files = []
     try:
         for input_file in test_video_files:
@@ -117,7 +66,8 @@ def test_reduce_video_size(test_video_files, optional_output_file, reduction_fac
             output_file = reduce_video_size(
                 input_file=input_file,
                 reduction_factor=reduction_factor,
-                output_file=optional_output_file
+                output_file=optional_output_file,
+                encoder=encoder
             )
             created_files.append(output_file)
             # Verifications
@@ -128,8 +78,8 @@ def test_reduce_video_size(test_video_files, optional_output_file, reduction_fac
             assert duration > 0, f"Reduced video has zero duration for {input_file}"
 
             # Check file size reduction with 1% tolerance
-            input_size = os.path.getsize(input_file)
-            output_size = os.path.getsize(output_file)
+            input_size = os.stat(input_file).st_size
+            output_size = os.stat(output_file).st_size
             target_size = input_size * reduction_factor
             assert output_size <= target_size * (1 + TOLERANCE), \
                 f"Output size {output_size} and input size {input_size} are not " \
@@ -141,8 +91,82 @@ def test_reduce_video_size(test_video_files, optional_output_file, reduction_fac
                 output_file.unlink()
 
 
+@pytest.mark.parametrize("encoder", ENCODERS)
+@pytest.mark.parametrize("use_output_files", [False, True])
+# A reduction factor of 1 exercises the stream copy path for .mp4 inputs, not the encoder
+@pytest.mark.parametrize("reduction_factors", [[0.2, 0.5, 1]])
+def test_reduce_video_size_multi(
+    test_video_files, tmp_path, use_output_files, reduction_factors, encoder
+):
+    """
+    Test video size reduction with several reduction factors in a single pass
+    """
+    created_files = []
+    try:
+        for input_file in test_video_files:
+            output_files = [
+                str(tmp_path / f"reduced_{index}.mp4") for index in range(len(reduction_factors))
+            ] if use_output_files else None
+
+            # Perform video size reduction
+            reduced_files = reduce_video_size_multi(
+                input_file=input_file,
+                reduction_factors=reduction_factors,
+                output_files=output_files,
+                encoder=encoder
+            )
+            created_files.extend(reduced_files)
+            assert len(reduced_files) == len(reduction_factors), \
+                f"Expected one output file per reduction factor for {input_file}"
+
+            input_size = os.stat(input_file).st_size
+            for reduction_factor, output_file in zip(reduction_factors, reduced_files):
+                # Verifications
+                assert output_file.exists(), f"Output file was not created for {input_file}"
+
+                # Verify video is valid
+                duration = get_media_duration(output_file)
+                assert duration > 0, f"Reduced video has zero duration for {input_file}"
+
+                # Check file size reduction with 1% tolerance
+                output_size = os.stat(output_file).st_size
+                target_size = input_size * reduction_factor
+                assert output_size <= target_size * (1 + TOLERANCE), \
+                    f"Output size {output_size} and input size {input_size} are not " \
+                    f"respecting the reduction_factor of {reduction_factor} (with 1% tolerance)"
+
+                # Check that only .mp4 inputs are copied (identical video stream) without reduction
+                if reduction_factor == 1:
+                    is_copied = get_video_bitrate(output_file) == get_video_bitrate(input_file)
+                    assert is_copied == input_file.endswith(".mp4"), \
+                        f"Only .mp4 inputs should be copied without reduction. Got {input_file}"
+    finally:
+        # Ensure cleanup of all created files
+        for output_file in created_files:
+            if output_file and output_file.exists():
+                output_file.unlink()
+
+
+def test_reduce_video_size_multi_rejects_duplicate_output_files(tmp_path):
+    """
+    Test that two reductions cannot be written to the same output file
+    """
+    # Both names resolve to the same .mp4 file
+    output_files = [str(tmp_path / "reduced.mp4"), str(tmp_path / "reduced")]
+    with pytest.raises(ValueError, match="Output files must be distinct"):
+        reduce_video_size_multi(
+            input_file="input.mp4",
+            reduction_factors=[0.2, 0.5],
+            output_files=output_files
+        )
+
+
+@pytest.mark.parametrize("encoder", ENCODERS)
+# A reduction factor of 1 still re-encodes the videos before merging them
 @pytest.mark.parametrize("reduction_factor", [0.2, 0.5, 1])
-def test_reduce_and_merge_videos(test_video_files, optional_output_file, reduction_factor):
+def test_reduce_and_merge_videos(
+    test_video_files, optional_output_file, reduction_factor, encoder
+):
     """
     Test video reduction and merging
     """
@@ -153,7 +177,8 @@ def test_reduce_and_merge_videos(test_video_files, optional_output_file, reducti
         output_file = reduce_and_merge_videos(
             input_files=input_files,
             reduction_factor=reduction_factor,
-            output_file=optional_output_file
+            output_file=optional_output_file,
+            encoder=encoder
         )
         created_files.append(output_file)
         # Verifications
@@ -164,10 +189,10 @@ def test_reduce_and_merge_videos(test_video_files, optional_output_file, reducti
         assert duration > 0, "Reduced video has zero duration"
 
         # Check file size with 1% tolerance
-        total_input_size = int(np.sum([
-            os.path.getsize(input_file) for input_file in input_files
-        ]))
-        output_size = os.path.getsize(output_file)
+        total_input_size = sum(
+            os.stat(input_file).st_size for input_file in input_files
+        )
+        output_size = os.stat(output_file).st_size
         target_size = total_input_size * reduction_factor
         assert output_size <= target_size * (1 + TOLERANCE), \
             f"Output size {output_size} and input size {total_input_size} are not " \
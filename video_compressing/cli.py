@@ -3,7 +3,7 @@ This module contains the CLI for the video compressor.
 """
 
 import argparse
-from video_compressing.processor import reduce_and_merge_videos
+from video_compressing.processor import ENCODERS, reduce_and_merge_videos
 
 def main():
     """
@@ -38,6 +38,14 @@ def main():
         help="Output file name. If not specified, a default name will be generated."
     )
 
+    # Add optional argument for the encoder
+    parser.add_argument(
+        "-e", "--encoder",
+        choices=ENCODERS,
+        default="auto",
+        help="H.264 encoder to use. 'auto' uses h264_nvenc when an NVIDIA GPU is available."
+    )
+
     # Parse the arguments
     args = parser.parse_args()
 
@@ -45,7 +53,8 @@ def main():
     output_path = reduce_and_merge_videos(
         input_files=args.input_files,
         reduction_factor=args.reduction_factor,
-        output_file=args.output_file
+        output_file=args.output_file,
+        encoder=args.encoder
     )
 
     # Output message
@@ -2,7 +2,7 @@
 This module contains the logic for compressing and merging videos.
 """
 
-from typing import Union, List, Optional, Dict
+from typing import Union, List, Optional, Dict, Tuple
 import os
 import uuid
 import subprocess
@@ -10,38 +10,101 @@ import logging
 from pathlib import Path
 from tqdm import tqdm
 import ffmpeg
-from video_compressing.utils import get_video_bitrate, get_audio_bitrate
+from video_compressing.utils import get_video_bitrate, get_audio_bitrate, is_nvenc_available
 
 logger = logging.getLogger(__file__)
 
 
-def _get_params_for_compression(input_file: str, reduction_factor: float) -> Dict:
+ENCODERS = ("auto", "libx264", "h264_nvenc")
+
+# Reduction factors this close to 1 copy the streams instead of re-encoding them
+PASSTHROUGH_EPSILON = 1e-6
+
+
+def _resolve_encoder(encoder: str) -> str:
+    if encoder not in ENCODERS:
+        raise ValueError(f"Encoder must be one of {ENCODERS}. Got {encoder}")
+    # Use the GPU encoder whenever it is usable
+    if encoder == "auto":
+        return "h264_nvenc" if is_nvenc_available() else "libx264"
+    return encoder
+
+
+def _get_ffmpeg_threads() -> int:
+    # 0 lets FFmpeg use all the cores. FFMPEG_THREADS allows capping it when
+    # several FFmpeg processes run in parallel.
+    threads = os.environ.get("FFMPEG_THREADS", "0")
+    if not threads.isdigit():
+        raise ValueError(f"FFMPEG_THREADS must be a non-negative integer. Got {threads}")
+    return int(threads)
+
+
+def _get_input_params(encoder: str) -> Dict:
+    # Decode on the GPU when the input codec supports it. FFmpeg falls back to
+    # software decoding otherwise, so the frames are uploaded by the video filter.
+    if encoder == "h264_nvenc":
+        return {"hwaccel": "cuda"}
+    return {}
+
+
+def _is_stream_copy(input_file: str, reduction_factor: float, stream_copy: bool) -> bool:
+    # No reduction: copy the streams (no re-encoding). Only .mp4 inputs are copied, since
+    # .mov inputs may hold codecs that the .mp4 output cannot (e.g. ProRes).
+    video_format = input_file.split(".")[-1]
+    return stream_copy and video_format == "mp4" and reduction_factor >= 1 - PASSTHROUGH_EPSILON
+
+
+def _get_bitrates(input_file: str) -> Tuple[int, int]:
+    # Video and audio bitrates of the input
+    return get_video_bitrate(input_file), get_audio_bitrate(input_file)
+
+
+def _get_params_for_compression(
+    input_file: str,
+    reduction_factor: float,
+    encoder: str = "libx264",
+    stream_copy: bool = True,
+    bitrates: Optional[Tuple[int, int]] = None,
+) -> Dict:
     # Get video format
     video_format = input_file.split(".")[-1]
+    if video_format not in ("mov", "mp4"):
+        raise ValueError(f"Video format {video_format} is not supported")
 
-    # Determine best params given video format
-    if video_format == "mov":
+    if _is_stream_copy(input_file, reduction_factor, stream_copy):
+        return {"c": "copy", "threads": _get_ffmpeg_threads()}
+
+    # Determine best params given encoder
+    if encoder == "h264_nvenc":
         ideal_params = {
-            "vf": f"scale=iw*{reduction_factor}:ih*{reduction_factor}",
+            # Upload the frames to the GPU and scale them there
+            "vf": (
+                "format=nv12,hwupload_cuda,"
+                f"scale_cuda=iw*{reduction_factor}:ih*{reduction_factor}"
+            ),
             "acodec": "aac",  # Specify AAC codec for audio
-            "vcodec": "libx264",  # Specify H.264 codec for video
-            "preset": "veryslow",  # Compression preset
-            "crf": int(23 / reduction_factor),  # Quality parameter for H.264
+            "vcodec": "h264_nvenc",  # Specify NVIDIA's H.264 codec for video
+            "preset": "p4",  # Compression preset
+            "rc": "vbr",  # Rate control mode
+            "cq": min(int(23 / reduction_factor), 51),  # Quality parameter for NVENC
         }
-    elif video_format == "mp4":
-        video_bitrate = get_video_bitrate(input_file)
-        audio_bitrate = get_audio_bitrate(input_file)
+    else:
         ideal_params = {
             "vf": f"scale=iw*{reduction_factor}:ih*{reduction_factor}",
             "acodec": "aac",  # Specify AAC codec for audio
             "vcodec": "libx264",  # Specify H.264 codec for video
-            "video_bitrate": f"{int(video_bitrate * reduction_factor ** 2)}k",
-            "audio_bitrate": f"{int(audio_bitrate * reduction_factor ** 2)}k",
             "preset": "veryslow",  # Compression preset
             "crf": int(23 / reduction_factor),  # Quality parameter for H.264
         }
-    else:
-        raise ValueError(f"Video format {video_format} is not supported")
+
+    # Determine best params given video format
+    if video_format == "mp4":
+        video_bitrate, audio_bitrate = bitrates or _get_bitrates(input_file)
+        ideal_params["video_bitrate"] = f"{int(video_bitrate * reduction_factor ** 2)}k"
+        ideal_params["audio_bitrate"] = f"{int(audio_bitrate * reduction_factor ** 2)}k"
+
+    # Number of encoding threads
+    ideal_params["threads"] = _get_ffmpeg_threads()
 
     return ideal_params
 
@@ -77,8 +140,9 @@ def merge_videos_to_single_mp4(
         file_list (List[str]): List of videos files to merge.
         output_file (str): Path to the output merged MP4 file.
     """
-    # Validate output path
+    # Validate output path and number of threads (before creating the temporary file)
     validated_output_file = _validate_output_file(file_list[0], output_file)
+    threads = _get_ffmpeg_threads()
 
     # Create a temporary file list for FFmpeg
     temp_file = f"{uuid.uuid1()}.txt"
@@ -97,6 +161,8 @@ def merge_videos_to_single_mp4(
         temp_file,  # Input list file
         "-c",
         "copy",  # Copy codec (no re-encoding)
+        "-threads",
+        str(threads),  # Number of threads
         "-y",
         validated_output_file,  # Override the outputfile
     ]
@@ -117,10 +183,72 @@ def merge_videos_to_single_mp4(
     return Path(validated_output_file)
 
 
+def _reduce_video_size(
+    input_file: str,
+    reduction_factors: List[Union[int, float]],
+    output_files: Optional[List[str]],
+    encoder: str,
+    stream_copy: bool,
+) -> List[Path]:
+    # Input validation
+    for reduction_factor in reduction_factors:
+        if not 0 < reduction_factor <= 1:
+            raise ValueError(
+                f"Reduction_factor must be between 0 and 1. Got {reduction_factor}"
+            )
+    if output_files is None:
+        output_files = [None] * len(reduction_factors)
+    elif len(output_files) != len(reduction_factors):
+        raise ValueError(
+            f"Got {len(output_files)} output files for {len(reduction_factors)} reduction factors"
+        )
+
+    # Validate output paths and encoder
+    validated_output_files = [
+        _validate_output_file(input_file, output_file) for output_file in output_files
+    ]
+    if len({file.resolve() for file in validated_output_files}) != len(validated_output_files):
+        raise ValueError(f"Output files must be distinct. Got {output_files}")
+    resolved_encoder = _resolve_encoder(encoder)
+
+    # Probe the bitrates of .mp4 inputs once for all the encoded outputs
+    bitrates = None
+    if input_file.split(".")[-1] == "mp4" and not all(
+        _is_stream_copy(input_file, reduction_factor, stream_copy)
+        for reduction_factor in reduction_factors
+    ):
+        bitrates = _get_bitrates(input_file)
+
+    try:
+        input_stream = ffmpeg.input(input_file, **_get_input_params(resolved_encoder))
+        output_streams = [
+            ffmpeg.output(
+                input_stream,
+                str(validated_output_file),
+                y=None,
+                **_get_params_for_compression(
+                    input_file=input_file,
+                    reduction_factor=reduction_factor,
+                    encoder=resolved_encoder,
+                    stream_copy=stream_copy,
+                    bitrates=bitrates,
+                ),
+            )
+            for reduction_factor, validated_output_file in zip(
+                reduction_factors, validated_output_files
+            )
+        ]
+        ffmpeg.run(ffmpeg.merge_outputs(*output_streams), quiet=True)
+        return validated_output_files
+    except ffmpeg.Error as e:
+        raise RuntimeError("Error occurred:", e.stderr) from e
+
+
 def reduce_video_size(
     input_file: str,
     reduction_factor: Union[int, float],
     output_file: Optional[str] = None,
+    encoder: str = "auto",
 ) -> Path:
     """
     Reduces the size of a video file by adjusting its bitrate and scaling.
@@ -129,33 +257,57 @@ def reduce_video_size(
         input_file (str): Path to the input file.
         output_file (str): Path to save the output reduced-size video.
         reduction_factor (Union[int, float]): Factor by which to reduce the video size.
-            A value of 1 means no reduction, 0.5 means reducing the size to half, and so on.
+            A value of 1 means no reduction (the streams of .mp4 inputs are copied without
+            re-encoding),
+            0.5 means reducing the size to half, and so on.
+        encoder (str): H.264 encoder to use: "libx264", "h264_nvenc" (NVIDIA GPU),
+            or "auto" to use h264_nvenc whenever it is available.
     """
-    # Input validation
-    if not 0 < reduction_factor <= 1:
-        raise ValueError(
-            f"Reduction_factor must be between 0 and 1. Got {reduction_factor}"
-        )
+    return reduce_video_size_multi(
+        input_file=input_file,
+        reduction_factors=[reduction_factor],
+        output_files=[output_file],
+        encoder=encoder,
+    )[0]
 
-    # Validate output path
-    validated_output_file = _validate_output_file(input_file, output_file)
 
-    try:
-        input_stream = ffmpeg.input(input_file)
-        compression_params = _get_params_for_compression(
-            input_file=input_file, reduction_factor=reduction_factor
-        )
-        output_stream = ffmpeg.output(
-            input_stream, str(validated_output_file), y=None, **compression_params
-        )
-        ffmpeg.run(output_stream, quiet=True)
-        return validated_output_file
-    except ffmpeg.Error as e:
-        raise RuntimeError("Error occurred:", e.stderr) from e
+def reduce_video_size_multi(
+    input_file: str,
+    reduction_factors: List[Union[int, float]],
+    output_files: Optional[List[str]] = None,
+    encoder: str = "auto",
+) -> List[Path]:
+    """
+    Reduces the size of a video file with several reduction factors at once.
+    The input is demuxed and decoded a single time, and each reduced video is
+    encoded as a separate output of the same FFmpeg command.
+
+    Args:
+        input_file (str): Path to the input file.
+        reduction_factors (List[Union[int, float]]): Factors by which to reduce the video size,
+            one per output. See `reduce_video_size`.
+        output_files (List[str]): Paths to save the output reduced-size videos, in the order
+            of `reduction_factors`. If not specified, default names will be generated.
+        encoder (str): H.264 encoder to use: "libx264", "h264_nvenc" (NVIDIA GPU),
+            or "auto" to use h264_nvenc whenever it is available.
+
+    Returns:
+        List[Path]: Paths of the reduced videos, in the order of `reduction_factors`.
+    """
+    return _reduce_video_size(
+        input_file=input_file,
+        reduction_factors=reduction_factors,
+        output_files=output_files,
+        encoder=encoder,
+        stream_copy=True,
+    )
 
 
 def reduce_and_merge_videos(
-    input_files: List[str], reduction_factor: float, output_file: Optional[str] = None
+    input_files: List[str],
+    reduction_factor: float,
+    output_file: Optional[str] = None,
+    encoder: str = "auto",
 ) -> Path:
     """
     The following tasks are performed:
@@ -167,16 +319,26 @@ def reduce_and_merge_videos(
         input_files (List[str]): List of input .MOV video file paths to be reduced and merged.
         output_file (str): Path to the output file to save the merged video.
         reduction_factor (float): Factor by which to reduce the video size.
-        A value of 1 means no reduction.
+        A value of 1 means no reduction (the videos are still re-encoded to H.264/AAC,
+        so that inputs of different codecs or containers can be merged).
         0.5 means reducing the size to half, and so on.
+        encoder (str): H.264 encoder to use: "libx264", "h264_nvenc" (NVIDIA GPU),
+        or "auto" to use h264_nvenc whenever it is available.
 
     Returns:
         None. The function reduces the size of the input video files, merges them,
         and saves the merged video to the specified output file.
     """
     # Save reduced video files in the temporary folder
+    # (never by stream copy, since the merge requires identical codecs and parameters)
     reduced_files = [
-        reduce_video_size(file, reduction_factor)
+        _reduce_video_size(
+            input_file=file,
+            reduction_factors=[reduction_factor],
+            output_files=None,
+            encoder=encoder,
+            stream_copy=False,
+        )[0]
         for file in tqdm(input_files, desc="Reducing Size")
     ]
 
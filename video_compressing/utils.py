@@ -3,6 +3,7 @@ This module contains the utility functions.
 """
 
 import os
+import functools
 from stat import ST_MTIME
 from typing import List
 import subprocess
@@ -43,8 +44,19 @@ def size_of_files(file_list: List[str]) -> float:
 
 def get_media_duration(file: str) -> float:
     """
-    Retrieve the duration of a media file using ffprobe
+    Retrieve the duration of a media file using ffprobe.
+    Results are cached until the file is modified.
     """
+    try:
+        mtime_ns = os.stat(file).st_mtime_ns
+    except OSError as e:
+        raise ValueError(f"Media file {file} is missing or unreadable: {e}") from e
+    return _get_media_duration_cached(os.path.abspath(file), mtime_ns)
+
+
+@functools.lru_cache(maxsize=256)
+def _get_media_duration_cached(file: str, _mtime_ns: int) -> float:
+    # _mtime_ns is only part of the cache key, so that modified files are probed again
     try:
         result = subprocess.run(
             [
@@ -55,7 +67,7 @@ def get_media_duration(file: str) -> float:
                 "format=duration",
                 "-of",
                 "default=noprint_wrappers=1:nokey=1",
-                str(file),
+                file,
             ],
             capture_output=True,
             text=True,
@@ -67,6 +79,39 @@ def get_media_duration(file: str) -> float:
         raise ValueError(f"FFprobe failed to analyze reduced video: {e}") from e
 
 
+@functools.lru_cache(maxsize=None)
+def is_nvenc_available() -> bool:
+    """
+    Check (once per process) whether FFmpeg can encode with NVIDIA's h264_nvenc encoder.
+
+    A tiny test encode is run rather than just listing the encoders, since FFmpeg builds
+    often ship h264_nvenc even on machines without a usable GPU.
+    """
+    try:
+        result = subprocess.run(
+            [
+                "ffmpeg",
+                "-v",
+                "error",
+                "-f",
+                "lavfi",
+                "-i",
+                "nullsrc=size=256x256:duration=0.1",
+                "-c:v",
+                "h264_nvenc",
+                "-f",
+                "null",
+                "-",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=False,
+        )
+    except OSError:
+        return False
+    return result.returncode == 0
+
+
 def get_files_with_full_path(directory: str) -> List[str]:
     """
     Get the full paths of all files in the specified directory.